@@ -1,15 +1,32 @@
-from fastapi import FastAPI, APIRouter, HTTPException, Query
+import time
+_IMPORT_STARTED = time.perf_counter()
+
+from fastapi import FastAPI, APIRouter, HTTPException, Query, BackgroundTasks, UploadFile, File, Request, Response
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
 from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo.read_preferences import Primary, PrimaryPreferred, Secondary, SecondaryPreferred, Nearest
 import os
+import asyncio
+import contextvars
+import zipfile
+import multiprocessing
+import csv
+import codecs
+import itertools
+import math
+import importlib
+import io
+import typing
+from concurrent.futures import ProcessPoolExecutor
 import logging
 from pathlib import Path
 from pydantic import BaseModel, Field
 from typing import List, Optional
 import uuid
-from datetime import datetime, timezone
+from datetime import datetime, timezone, timedelta
 from enum import Enum
+from fastapi.responses import JSONResponse, FileResponse, StreamingResponse
 
 
 ROOT_DIR = Path(__file__).parent
@@ -18,12 +35,16 @@ load_dotenv(ROOT_DIR / '.env')
 # MongoDB connection
 # MongoDB connection with certifi CA
 import certifi
-from motor.motor_asyncio import AsyncIOMotorClient
-import os
+from statements import render_statement_chunk
 
 mongo_url = os.environ['MONGO_URL']
 db_name = os.environ['DB_NAME']
 
+# When DEFERRED_STARTUP is on, the app serves liveness immediately and the
+# DB ping, index creation and warmup run in the background (for scale-to-zero).
+DEFERRED_STARTUP = os.environ.get('DEFERRED_STARTUP', 'true').lower() in ('1', 'true', 'yes')
+
+# The client connects lazily, so building it here does not block on the network
 client = AsyncIOMotorClient(
     mongo_url,
     tls=True,
@@ -32,18 +53,135 @@ client = AsyncIOMotorClient(
 )
 db = client[db_name]
 
+# Dashboard, columnar export and statement reads go through reporting_db so
+# they can be served by secondaries; the CRUD listings, reconciliation,
+# transactional reads and all writes stay on db (primary)
+READ_PREFERENCE_MODES = {
+    'primary': Primary,
+    'primaryPreferred': PrimaryPreferred,
+    'secondary': Secondary,
+    'secondaryPreferred': SecondaryPreferred,
+    'nearest': Nearest,
+}
+REPORTING_READ_PREFERENCE = os.environ.get('REPORTING_READ_PREFERENCE', 'secondaryPreferred')
+# MongoDB requires maxStalenessSeconds to be at least 90 (-1 disables the bound)
+REPORTING_MAX_STALENESS_SECONDS = int(os.environ.get('REPORTING_MAX_STALENESS_SECONDS', '90'))
+
+def build_reporting_read_preference():
+    if REPORTING_READ_PREFERENCE not in READ_PREFERENCE_MODES:
+        raise ValueError(f"Unknown REPORTING_READ_PREFERENCE: {REPORTING_READ_PREFERENCE}")
+    if REPORTING_MAX_STALENESS_SECONDS != -1 and REPORTING_MAX_STALENESS_SECONDS < 90:
+        raise ValueError(
+            f"REPORTING_MAX_STALENESS_SECONDS must be -1 or at least 90, got {REPORTING_MAX_STALENESS_SECONDS}"
+        )
+    mode = READ_PREFERENCE_MODES[REPORTING_READ_PREFERENCE]
+    if mode is Primary:
+        return Primary()
+    return mode(max_staleness=REPORTING_MAX_STALENESS_SECONDS)
+
+reporting_db = client.get_database(db_name, read_preference=build_reporting_read_preference())
+
+# Per-request {"request": label, "nodes": [...]} for reads that expose the
+# node that served them
+served_by_nodes = contextvars.ContextVar('served_by_nodes', default=None)
+# Echo served-by nodes in an X-Served-By response header; debugging only, as
+# it exposes internal replica addresses
+SERVED_BY_HEADER = os.environ.get('SERVED_BY_HEADER', 'false').lower() in ('1', 'true', 'yes')
+
+def record_served_by(cursor):
+    address = getattr(cursor, 'address', None)
+    served_by = served_by_nodes.get()
+    if address and served_by is not None:
+        node = f"{address[0]}:{address[1]}"
+        if node not in served_by["nodes"]:
+            served_by["nodes"].append(node)
+            logger.info("%s served by %s", served_by["request"], node)
+
+async def count_served(collection, query):
+    # count_documents does not expose its cursor, so run the equivalent
+    # aggregation to learn which node answered
+    cursor = collection.aggregate([{"$match": query}, {"$count": "count"}])
+    result = await cursor.to_list(1)
+    record_served_by(cursor)
+    return result[0]["count"] if result else 0
+
+# Phase name -> seconds, logged once startup work has finished
+startup_timings = {}
+db_ready = asyncio.Event()
+db_startup_error: Optional[str] = None
 
 
 # Create the main app without a prefix
 app = FastAPI(title="College Resource Planning System", version="1.0.0")
 
-@app.on_event("startup")
-async def startup_ping():
+
+async def ensure_indexes():
+    await db.students.create_index("id", unique=True)
+    await db.students.create_index("student_id")
+    await db.students.create_index([("course", 1), ("year", 1)])
+    await db.fee_structures.create_index("id", unique=True)
+    await db.payments.create_index("id", unique=True)
+    await db.payments.create_index("student_id")
+    await db.payments.create_index("transaction_id")
+    await db.payments.create_index([("amount", 1), ("payment_date", 1)])
+    await db.expenses.create_index("category")
+    await db.student_fee_records.create_index("student_id")
+    await db.statement_jobs.create_index("id", unique=True)
+
+
+async def warmup():
+    # Touch the hot collections so the first real request does not pay for
+    # connection pool growth and cold working-set pages
+    await asyncio.gather(
+        db.students.find_one({}),
+        db.fee_structures.find_one({}),
+        db.payments.find_one({}),
+    )
+
+
+async def run_db_startup():
+    global db_startup_error
+    phases = [("db_ping", lambda: db.command("ping")), ("ensure_indexes", ensure_indexes), ("warmup", warmup)]
+    phase = None
     try:
-        await db.command("ping")
-        print("✅ MongoDB ping OK")
+        for phase, run_phase in phases:
+            started = time.perf_counter()
+            await run_phase()
+            startup_timings[phase] = time.perf_counter() - started
+            if phase == "db_ping":
+                print("✅ MongoDB ping OK")
+
+        db_startup_error = None
+        db_ready.set()
     except Exception as e:
-        print("❌ MongoDB ping failed:", e)
+        db_startup_error = f"{phase} failed: {e}"
+        print(f"❌ MongoDB startup {phase} failed:", e)
+    finally:
+        logger.info(
+            "Startup timings: %s",
+            ", ".join(f"{name}={seconds * 1000:.1f}ms" for name, seconds in startup_timings.items())
+        )
+
+
+@app.on_event("startup")
+async def startup_ping():
+    startup_timings["import"] = _APP_IMPORTED - _IMPORT_STARTED
+    startup_timings["import_to_startup"] = time.perf_counter() - _APP_IMPORTED
+    if DEFERRED_STARTUP:
+        app.state.db_startup_task = asyncio.create_task(run_db_startup())
+    else:
+        await run_db_startup()
+
+@app.middleware("http")
+async def record_served_by_middleware(request, call_next):
+    # The dict is shared with the endpoint's context, so nodes recorded while
+    # handling the request are visible here afterwards
+    served_by = {"request": f"{request.method} {request.url.path}", "nodes": []}
+    served_by_nodes.set(served_by)
+    response = await call_next(request)
+    if SERVED_BY_HEADER and served_by["nodes"]:
+        response.headers["X-Served-By"] = ",".join(served_by["nodes"])
+    return response
 
 # Create a router with the /api prefix
 api_router = APIRouter(prefix="/api")
@@ -163,6 +301,73 @@ class ExpenseCreate(BaseModel):
     expense_date: datetime
     vendor: Optional[str] = None
 
+# Batch lookup models
+BATCH_MAX_IDS = int(os.environ.get('BATCH_MAX_IDS', '500'))
+
+class BatchLookupRequest(BaseModel):
+    ids: List[str] = Field(..., min_length=1, max_length=BATCH_MAX_IDS)
+
+class StudentBatchItem(BaseModel):
+    id: str
+    found: bool
+    item: Optional[Student] = None
+
+class FeeStructureBatchItem(BaseModel):
+    id: str
+    found: bool
+    item: Optional[FeeStructure] = None
+
+class PaymentBatchItem(BaseModel):
+    id: str
+    found: bool
+    item: Optional[Payment] = None
+
+# Fee statement job models
+class StatementFormat(str, Enum):
+    HTML = "html"
+    CSV = "csv"
+
+class StatementJobStatus(str, Enum):
+    PENDING = "pending"
+    RUNNING = "running"
+    COMPLETED = "completed"
+    FAILED = "failed"
+
+class StatementJobCreate(BaseModel):
+    course: str
+    year: int
+    format: StatementFormat = StatementFormat.HTML
+
+class StatementJob(BaseModel):
+    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
+    course: str
+    year: int
+    format: StatementFormat
+    status: StatementJobStatus = StatementJobStatus.PENDING
+    total: int = 0
+    completed: int = 0
+    # Server filesystem paths: persisted with the job, never sent to clients
+    output_dir: Optional[str] = Field(default=None, exclude=True)
+    archive_path: Optional[str] = Field(default=None, exclude=True)
+    error: Optional[str] = None
+    created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+    finished_at: Optional[datetime] = None
+
+# Payment reconciliation models
+class ReconciliationReportKind(str, Enum):
+    MATCHED = "matched"
+    UNMATCHED = "unmatched"
+    MISMATCHED = "mismatched"
+
+class Reconciliation(BaseModel):
+    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
+    filename: Optional[str] = None
+    total_lines: int = 0
+    matched: int = 0
+    unmatched: int = 0
+    mismatched: int = 0
+    created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+
 # Helper function to prepare documents for MongoDB
 def prepare_for_mongo(data):
     if isinstance(data, dict):
@@ -174,12 +379,170 @@ def prepare_for_mongo(data):
 def parse_from_mongo(item):
     if isinstance(item, dict):
         for key, value in item.items():
-            if isinstance(value, str) and key in ['created_at', 'updated_at', 'due_date', 'payment_date', 'expense_date']:
+            if isinstance(value, str) and key in ['created_at', 'updated_at', 'due_date', 'payment_date', 'expense_date', 'finished_at']:
                 try:
                     item[key] = datetime.fromisoformat(value.replace('Z', '+00:00'))
                 except:
                     pass
     return item
+
+async def fetch_by_ids(collection, ids):
+    """Resolve ids with one indexed $in query, keyed by id (duplicates collapse)."""
+    docs = await collection.find({"id": {"$in": list(set(ids))}}, {"_id": 0}).to_list(None)
+    return {doc["id"]: parse_from_mongo(doc) for doc in docs}
+# Columnar responses for analytics clients. JSON stays the default; clients
+# opt in through the Accept header and get record batches streamed straight
+# from the cursor (without the 1000-row cap of the JSON listings)
+ARROW_STREAM_MEDIA_TYPE = "application/vnd.apache.arrow.stream"
+MSGPACK_MEDIA_TYPES = ("application/msgpack", "application/x-msgpack", "application/vnd.msgpack")
+COLUMNAR_BATCH_SIZE = int(os.environ.get('COLUMNAR_BATCH_SIZE', '5000'))
+
+def parse_accept(header):
+    """Media types from an Accept header, most preferred first; q=0 entries are dropped."""
+    entries = []
+    for part in header.split(","):
+        media_type, *params = [item.strip() for item in part.split(";")]
+        quality = 1.0
+        for param in params:
+            name, _, value = param.partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        if media_type and quality > 0:
+            entries.append((media_type.lower(), quality))
+    # sorted() is stable, so equal q-values keep the client's order
+    return [media_type for media_type, _ in sorted(entries, key=lambda entry: -entry[1])]
+
+def negotiate_columnar_format(request: Request):
+    for media_type in parse_accept(request.headers.get("accept", "")):
+        if media_type == ARROW_STREAM_MEDIA_TYPE:
+            return "arrow"
+        if media_type in MSGPACK_MEDIA_TYPES:
+            return "msgpack"
+        if media_type in ("application/json", "*/*"):
+            return None
+    return None
+
+def import_optional(module_name, media_type):
+    # Imported on first use so these packages do not slow down cold starts
+    try:
+        return importlib.import_module(module_name)
+    except ImportError:
+        raise HTTPException(status_code=406, detail=f"{media_type} responses require the '{module_name}' package")
+
+def columnar_fields(model):
+    """(name, kind) pairs for a model, where kind is string, float, int or timestamp."""
+    fields = []
+    for name, field in model.model_fields.items():
+        annotation = field.annotation
+        args = [arg for arg in typing.get_args(annotation) if arg is not type(None)]
+        if args:
+            annotation = args[0]
+        if annotation is datetime:
+            kind = "timestamp"
+        elif annotation is float:
+            kind = "float"
+        elif annotation is int:
+            kind = "int"
+        else:
+            kind = "string"
+        fields.append((name, kind))
+    return fields
+
+def columnar_value(value, kind):
+    # Values are converted while the response is streaming, after the status
+    # line is sent, so malformed values become null instead of raising
+    if value is None:
+        return None
+    if kind == "timestamp":
+        if isinstance(value, str):
+            try:
+                value = datetime.fromisoformat(value.replace('Z', '+00:00'))
+            except ValueError:
+                return None
+        if not isinstance(value, datetime):
+            return None
+        return value if value.tzinfo else value.replace(tzinfo=timezone.utc)
+    try:
+        if kind == "float":
+            return float(value)
+        if kind == "int":
+            return int(value)
+    except (TypeError, ValueError, OverflowError):
+        return None
+    return str(value)
+
+async def columnar_batches(cursor, fields):
+    columns = {name: [] for name, _ in fields}
+    length = 0
+    async for doc in cursor:
+        for name, kind in fields:
+            columns[name].append(columnar_value(doc.get(name), kind))
+        length += 1
+        if length == COLUMNAR_BATCH_SIZE:
+            yield columns, length
+            columns = {name: [] for name, _ in fields}
+            length = 0
+    if length:
+        yield columns, length
+    record_served_by(cursor)
+
+def drain(buffer: io.BytesIO):
+    data = buffer.getvalue()
+    buffer.seek(0)
+    buffer.truncate()
+    return data
+
+async def arrow_stream(cursor, fields, pa):
+    arrow_types = {
+        "string": pa.string(),
+        "float": pa.float64(),
+        "int": pa.int64(),
+        "timestamp": pa.timestamp("us", tz="UTC"),
+    }
+    schema = pa.schema([(name, arrow_types[kind]) for name, kind in fields])
+    buffer = io.BytesIO()
+    with pa.ipc.new_stream(buffer, schema) as writer:
+        async for columns, _ in columnar_batches(cursor, fields):
+            writer.write_batch(pa.record_batch(
+                [pa.array(columns[field.name], type=field.type) for field in schema],
+                schema=schema
+            ))
+            yield drain(buffer)
+    # Closing the writer emits the end-of-stream marker
+    yield drain(buffer)
+
+async def msgpack_stream(cursor, fields, msgpack):
+    # A header object followed by one {"length", "columns"} object per batch;
+    # read it back with msgpack.Unpacker
+    yield msgpack.packb({"fields": [{"name": name, "type": kind} for name, kind in fields]})
+    async for columns, length in columnar_batches(cursor, fields):
+        yield msgpack.packb({"length": length, "columns": columns}, datetime=True)
+
+def columnar_response(request: Request, response: Response, collection, query, model):
+    """Stream query results as Arrow or MessagePack when the client asks for it, else None."""
+    # The JSON response at the same URL varies on Accept too
+    response.headers["Vary"] = "Accept"
+    columnar_format = negotiate_columnar_format(request)
+    if columnar_format is None:
+        return None
+
+    if columnar_format == "arrow":
+        import_optional("pyarrow.ipc", ARROW_STREAM_MEDIA_TYPE)
+        pa = import_optional("pyarrow", ARROW_STREAM_MEDIA_TYPE)
+    else:
+        msgpack = import_optional("msgpack", MSGPACK_MEDIA_TYPES[0])
+
+    fields = columnar_fields(model)
+    projection = {"_id": 0, **{name: 1 for name, _ in fields}}
+    cursor = reporting_db[collection].find(query, projection).batch_size(COLUMNAR_BATCH_SIZE)
+    headers = {"Vary": "Accept"}
+    if columnar_format == "arrow":
+        return StreamingResponse(arrow_stream(cursor, fields, pa), media_type=ARROW_STREAM_MEDIA_TYPE, headers=headers)
+    return StreamingResponse(msgpack_stream(cursor, fields, msgpack), media_type=MSGPACK_MEDIA_TYPES[0], headers=headers)
+
 # Fee Structure endpoints
 @api_router.post("/fee-structures", response_model=FeeStructure)
 async def create_fee_structure(fee_structure: FeeStructureCreate):
@@ -190,8 +553,19 @@ async def create_fee_structure(fee_structure: FeeStructureCreate):
     return fee_obj
 
 @api_router.get("/fee-structures", response_model=List[FeeStructure])
-async def get_fee_structures():
-    fee_structures = await db.fee_structures.find().to_list(1000)
+async def get_fee_structures(request: Request, response: Response):
+    """List fee structures.
+
+    JSON is capped at 1000 rows and read from the primary. Arrow/MessagePack
+    return every row from the reporting handle and may lag recent writes.
+    """
+    columnar = columnar_response(request, response, "fee_structures", {}, FeeStructure)
+    if columnar is not None:
+        return columnar
+
+    cursor = db.fee_structures.find()
+    fee_structures = await cursor.to_list(1000)
+    record_served_by(cursor)
     return [FeeStructure(**parse_from_mongo(fs)) for fs in fee_structures]
 
 @api_router.get("/fee-structures/{fee_id}", response_model=FeeStructure)
@@ -201,6 +575,15 @@ async def get_fee_structure(fee_id: str):
         raise HTTPException(status_code=404, detail="Fee structure not found")
     return FeeStructure(**parse_from_mongo(fee_structure))
 
+@api_router.post("/fee-structures/batch", response_model=List[FeeStructureBatchItem])
+async def get_fee_structures_batch(request: BatchLookupRequest):
+    found = await fetch_by_ids(db.fee_structures, request.ids)
+    return [
+        FeeStructureBatchItem(id=fee_id, found=fee_id in found,
+                              item=FeeStructure(**found[fee_id]) if fee_id in found else None)
+        for fee_id in request.ids
+    ]
+
 
 # Student endpoints
 @api_router.post("/students", response_model=Student)
@@ -222,7 +605,12 @@ async def create_student(student: StudentCreate):
 
 
 @api_router.get("/students", response_model=List[Student])
-async def get_students(search: Optional[str] = Query(None), course: Optional[str] = Query(None)):
+async def get_students(request: Request, response: Response, search: Optional[str] = Query(None), course: Optional[str] = Query(None)):
+    """List students, optionally filtered by search text and course.
+
+    JSON is capped at 1000 rows and read from the primary. Arrow/MessagePack
+    return every row from the reporting handle and may lag recent writes.
+    """
     query = {}
     if search:
         query["$or"] = [
@@ -232,10 +620,32 @@ async def get_students(search: Optional[str] = Query(None), course: Optional[str
         ]
     if course:
         query["course"] = course
+
+    columnar = columnar_response(request, response, "students", query, Student)
+    if columnar is not None:
+        return columnar
     
-    students = await db.students.find(query).to_list(1000)
+    cursor = db.students.find(query)
+    students = await cursor.to_list(1000)
+    record_served_by(cursor)
     return [Student(**parse_from_mongo(student)) for student in students]
 
+@api_router.get("/students/{student_id}", response_model=Student)
+async def get_student(student_id: str):
+    student = await db.students.find_one({"id": student_id})
+    if not student:
+        raise HTTPException(status_code=404, detail="Student not found")
+    return Student(**parse_from_mongo(student))
+
+@api_router.post("/students/batch", response_model=List[StudentBatchItem])
+async def get_students_batch(request: BatchLookupRequest):
+    found = await fetch_by_ids(db.students, request.ids)
+    return [
+        StudentBatchItem(id=student_id, found=student_id in found,
+                         item=Student(**found[student_id]) if student_id in found else None)
+        for student_id in request.ids
+    ]
+
 
 # ❌ Removed Student Fee Record endpoints
 
@@ -264,14 +674,34 @@ async def create_payment(payment: PaymentCreate):
 
 
 @api_router.get("/payments", response_model=List[Payment])
-async def get_payments(student_id: Optional[str] = Query(None)):
+async def get_payments(request: Request, response: Response, student_id: Optional[str] = Query(None)):
+    """List payments, optionally for one student.
+
+    JSON is capped at 1000 rows and read from the primary. Arrow/MessagePack
+    return every row from the reporting handle and may lag recent writes.
+    """
     query = {}
     if student_id:
         query["student_id"] = student_id
+
+    columnar = columnar_response(request, response, "payments", query, Payment)
+    if columnar is not None:
+        return columnar
     
-    payments = await db.payments.find(query).to_list(1000)
+    cursor = db.payments.find(query)
+    payments = await cursor.to_list(1000)
+    record_served_by(cursor)
     return [Payment(**parse_from_mongo(payment)) for payment in payments]
 
+@api_router.post("/payments/batch", response_model=List[PaymentBatchItem])
+async def get_payments_batch(request: BatchLookupRequest):
+    found = await fetch_by_ids(db.payments, request.ids)
+    return [
+        PaymentBatchItem(id=payment_id, found=payment_id in found,
+                         item=Payment(**found[payment_id]) if payment_id in found else None)
+        for payment_id in request.ids
+    ]
+
 # Expense endpoints
 @api_router.post("/expenses", response_model=Expense)
 async def create_expense(expense: ExpenseCreate):
@@ -282,19 +712,30 @@ async def create_expense(expense: ExpenseCreate):
     return expense_obj
 
 @api_router.get("/expenses", response_model=List[Expense])
-async def get_expenses(category: Optional[ExpenseCategory] = Query(None)):
+async def get_expenses(request: Request, response: Response, category: Optional[ExpenseCategory] = Query(None)):
+    """List expenses, optionally filtered by category.
+
+    JSON is capped at 1000 rows and read from the primary. Arrow/MessagePack
+    return every row from the reporting handle and may lag recent writes.
+    """
     query = {}
     if category:
         query["category"] = category
+
+    columnar = columnar_response(request, response, "expenses", query, Expense)
+    if columnar is not None:
+        return columnar
     
-    expenses = await db.expenses.find(query).to_list(1000)
+    cursor = db.expenses.find(query)
+    expenses = await cursor.to_list(1000)
+    record_served_by(cursor)
     return [Expense(**parse_from_mongo(expense)) for expense in expenses]
 
 # Dashboard endpoints
 @api_router.get("/dashboard/summary")
 async def get_dashboard_summary():
     # Get total students
-    total_students = await db.students.count_documents({})
+    total_students = await count_served(reporting_db.students, {})
     
     # Get total fees due and paid
     pipeline = [
@@ -306,20 +747,24 @@ async def get_dashboard_summary():
             }
         }
     ]
-    fee_summary = await db.student_fee_records.aggregate(pipeline).to_list(1)
+    cursor = reporting_db.student_fee_records.aggregate(pipeline)
+    fee_summary = await cursor.to_list(1)
+    record_served_by(cursor)
     
     total_due = fee_summary[0]["total_due"] if fee_summary else 0
     total_paid = fee_summary[0]["total_paid"] if fee_summary else 0
     pending_amount = total_due - total_paid
     
     # Get pending payments count
-    pending_payments = await db.student_fee_records.count_documents({"payment_status": "pending"})
+    pending_payments = await count_served(reporting_db.student_fee_records, {"payment_status": "pending"})
     
     # Get total expenses
     expense_pipeline = [
         {"$group": {"_id": None, "total_expenses": {"$sum": "$amount"}}}
     ]
-    expense_summary = await db.expenses.aggregate(expense_pipeline).to_list(1)
+    cursor = reporting_db.expenses.aggregate(expense_pipeline)
+    expense_summary = await cursor.to_list(1)
+    record_served_by(cursor)
     total_expenses = expense_summary[0]["total_expenses"] if expense_summary else 0
     
     return {
@@ -331,6 +776,444 @@ async def get_dashboard_summary():
         "net_revenue": total_paid - total_expenses
     }
 
+# Fee statement jobs
+OUTPUT_DIR = Path(os.environ.get('OUTPUT_DIR', ROOT_DIR / 'output'))
+STATEMENTS_DIR = OUTPUT_DIR / 'statements'
+STATEMENT_CHUNK_SIZE = int(os.environ.get('STATEMENT_CHUNK_SIZE', '250'))
+STATEMENT_WORKERS = int(os.environ.get('STATEMENT_WORKERS', os.cpu_count() or 1))
+# A running job refreshes heartbeat_at; one that stops refreshing (its
+# instance was scaled down or restarted) is reported as failed
+STATEMENT_JOB_HEARTBEAT_SECONDS = int(os.environ.get('STATEMENT_JOB_HEARTBEAT_SECONDS', '15'))
+STATEMENT_JOB_STALE_SECONDS = int(os.environ.get('STATEMENT_JOB_STALE_SECONDS', '120'))
+
+statement_executor: Optional[ProcessPoolExecutor] = None
+
+def get_statement_executor():
+    # Created on first use so worker processes do not slow down cold starts.
+    # forkserver keeps workers from inheriting the app's Motor/pymongo threads
+    global statement_executor
+    if statement_executor is None:
+        statement_executor = ProcessPoolExecutor(
+            max_workers=STATEMENT_WORKERS, mp_context=multiprocessing.get_context("forkserver")
+        )
+    return statement_executor
+
+async def build_statements(course, year):
+    """Build statements for a cohort with one query per collection, grouped server-side.
+
+    Fees due come from the student's fee records when there are any, plus
+    every fee structure the student has paid against that no fee record
+    already covers.
+    """
+    cursor = reporting_db.students.find({"course": course, "year": year}, {"_id": 0}).sort("student_id", 1)
+    students = await cursor.to_list(None)
+    record_served_by(cursor)
+    student_ids = [student["id"] for student in students]
+
+    fees_by_student = {}
+    fee_pipeline = [
+        {"$match": {"student_id": {"$in": student_ids}}},
+        {"$group": {
+            "_id": "$student_id",
+            "fees": {"$push": {
+                "fee_structure_id": "$fee_structure_id",
+                "fee_name": "$fee_name",
+                "amount_due": "$amount_due",
+                "due_date": "$due_date"
+            }}
+        }}
+    ]
+    cursor = reporting_db.student_fee_records.aggregate(fee_pipeline, allowDiskUse=True)
+    async for group in cursor:
+        fees_by_student[group["_id"]] = group
+    record_served_by(cursor)
+
+    payments_by_student = {}
+    payment_pipeline = [
+        {"$match": {"student_id": {"$in": student_ids}}},
+        {"$sort": {"payment_date": 1}},
+        {"$group": {
+            "_id": "$student_id",
+            "payments": {"$push": {
+                "payment_date": "$payment_date",
+                "amount": "$amount",
+                "payment_method": "$payment_method",
+                "transaction_id": "$transaction_id"
+            }},
+            "fee_structure_ids": {"$addToSet": "$fee_structure_id"},
+            "total_paid": {"$sum": "$amount"}
+        }}
+    ]
+    cursor = reporting_db.payments.aggregate(payment_pipeline, allowDiskUse=True)
+    async for group in cursor:
+        payments_by_student[group["_id"]] = group
+    record_served_by(cursor)
+
+    fee_structure_ids = {
+        fee_structure_id
+        for group in payments_by_student.values()
+        for fee_structure_id in group["fee_structure_ids"]
+        if fee_structure_id
+    }
+    fee_structures = {}
+    if fee_structure_ids:
+        cursor = reporting_db.fee_structures.find({"id": {"$in": list(fee_structure_ids)}}, {"_id": 0})
+        async for fee_structure in cursor:
+            fee_structures[fee_structure["id"]] = fee_structure
+        record_served_by(cursor)
+
+    statements = []
+    for student in students:
+        payments = payments_by_student.get(student["id"], {})
+        fees = list(fees_by_student.get(student["id"], {}).get("fees", []))
+        covered = {fee.get("fee_structure_id") for fee in fees}
+        for fee_structure_id in sorted(fee_id for fee_id in payments.get("fee_structure_ids", []) if fee_id):
+            fee_structure = fee_structures.get(fee_structure_id)
+            if fee_structure and fee_structure_id not in covered:
+                fees.append({
+                    "fee_structure_id": fee_structure_id,
+                    "fee_name": fee_structure["name"],
+                    "amount_due": fee_structure["amount"],
+                    "due_date": None
+                })
+        total_due = sum(fee.get("amount_due") or 0 for fee in fees)
+        total_paid = payments.get("total_paid", 0)
+        statements.append({
+            "student": {key: student.get(key) for key in ("id", "student_id", "name", "course", "year")},
+            "fees": fees,
+            "payments": payments.get("payments", []),
+            "total_due": total_due,
+            "total_paid": total_paid,
+            "balance": total_due - total_paid
+        })
+    return statements
+
+def statement_archive_path(job_id):
+    return STATEMENTS_DIR / f"{job_id}.zip"
+
+def write_statement_archive(job_id, output_dir):
+    with zipfile.ZipFile(statement_archive_path(job_id), "w", zipfile.ZIP_DEFLATED) as archive:
+        for path in sorted(Path(output_dir).iterdir()):
+            archive.write(path, arcname=path.name)
+
+async def save_statement_job(job: StatementJob, *fields):
+    # Job state lives in Mongo so polling and downloads survive restarts
+    await db.statement_jobs.update_one(
+        {"id": job.id}, {"$set": prepare_for_mongo({field: getattr(job, field) for field in fields})}
+    )
+
+async def statement_job_heartbeat(job_id):
+    while True:
+        await asyncio.sleep(STATEMENT_JOB_HEARTBEAT_SECONDS)
+        await db.statement_jobs.update_one(
+            {"id": job_id}, {"$set": {"heartbeat_at": datetime.now(timezone.utc).isoformat()}}
+        )
+
+async def find_statement_job(job_id):
+    job = await db.statement_jobs.find_one({"id": job_id}, {"_id": 0})
+    if not job:
+        raise HTTPException(status_code=404, detail="Statement job not found")
+
+    active = (StatementJobStatus.PENDING.value, StatementJobStatus.RUNNING.value)
+    heartbeat_at = datetime.fromisoformat(job["heartbeat_at"]) if job.get("heartbeat_at") else None
+    stale_before = datetime.now(timezone.utc) - timedelta(seconds=STATEMENT_JOB_STALE_SECONDS)
+    if job["status"] in active and heartbeat_at is not None and heartbeat_at < stale_before:
+        orphaned = {
+            "status": StatementJobStatus.FAILED.value,
+            "error": "Statement job stopped reporting progress; its server instance was probably restarted",
+            "finished_at": datetime.now(timezone.utc).isoformat()
+        }
+        # Conditional on the heartbeat we saw, so a job that just recovered is left alone
+        await db.statement_jobs.update_one(
+            {"id": job_id, "status": job["status"], "heartbeat_at": job["heartbeat_at"]}, {"$set": orphaned}
+        )
+        job.update(orphaned)
+    return StatementJob(**parse_from_mongo(job))
+
+async def run_statement_job(job: StatementJob):
+    job.status = StatementJobStatus.RUNNING
+    await save_statement_job(job, "status")
+    heartbeat = asyncio.create_task(statement_job_heartbeat(job.id))
+    try:
+        statements = await build_statements(job.course, job.year)
+        job.total = len(statements)
+
+        output_dir = STATEMENTS_DIR / job.id
+        output_dir.mkdir(parents=True, exist_ok=True)
+        job.output_dir = str(output_dir)
+        await save_statement_job(job, "total", "output_dir")
+
+        # Chunks keep inter-process overhead low while still spreading work
+        # across every worker
+        loop = asyncio.get_running_loop()
+        executor = get_statement_executor()
+        futures = [
+            loop.run_in_executor(
+                executor, render_statement_chunk,
+                statements[start:start + STATEMENT_CHUNK_SIZE], job.format.value, job.output_dir
+            )
+            for start in range(0, len(statements), STATEMENT_CHUNK_SIZE)
+        ]
+        for future in asyncio.as_completed(futures):
+            job.completed += await future
+            await save_statement_job(job, "completed")
+
+        await asyncio.to_thread(write_statement_archive, job.id, output_dir)
+        job.archive_path = str(statement_archive_path(job.id))
+        job.status = StatementJobStatus.COMPLETED
+    except Exception as e:
+        logger.exception("Statement job %s failed", job.id)
+        job.status = StatementJobStatus.FAILED
+        job.error = str(e)
+    finally:
+        heartbeat.cancel()
+        job.finished_at = datetime.now(timezone.utc)
+        await save_statement_job(job, "status", "archive_path", "error", "finished_at")
+
+@api_router.post("/statements/jobs", response_model=StatementJob)
+async def create_statement_job(job_request: StatementJobCreate, background_tasks: BackgroundTasks):
+    job = StatementJob(**job_request.dict())
+    job_doc = prepare_for_mongo(job.dict())
+    job_doc["heartbeat_at"] = job_doc["created_at"]
+    await db.statement_jobs.insert_one(job_doc)
+    background_tasks.add_task(run_statement_job, job)
+    return job
+
+@api_router.get("/statements/jobs/{job_id}", response_model=StatementJob)
+async def get_statement_job(job_id: str):
+    return await find_statement_job(job_id)
+
+@api_router.get("/statements/jobs/{job_id}/download")
+async def download_statement_job(job_id: str):
+    job = await find_statement_job(job_id)
+    if job.status != StatementJobStatus.COMPLETED:
+        raise HTTPException(status_code=409, detail=f"Statement job is {job.status.value}")
+    if not job.archive_path or not Path(job.archive_path).exists():
+        raise HTTPException(status_code=410, detail="Statement archive is no longer available")
+    return FileResponse(
+        job.archive_path,
+        media_type="application/zip",
+        filename=f"statements-{job.course}-{job.year}.zip".replace(" ", "_")
+    )
+
+# Payment reconciliation
+RECONCILIATION_DIR = OUTPUT_DIR / 'reconciliation'
+RECONCILIATION_CHUNK_SIZE = int(os.environ.get('RECONCILIATION_CHUNK_SIZE', '1000'))
+RECONCILIATION_DATE_WINDOW_DAYS = int(os.environ.get('RECONCILIATION_DATE_WINDOW_DAYS', '3'))
+RECONCILIATION_AMOUNT_TOLERANCE = float(os.environ.get('RECONCILIATION_AMOUNT_TOLERANCE', '0.01'))
+# Amounts are compared in integer cents so a 1-cent tolerance is not lost
+# to float rounding
+RECONCILIATION_TOLERANCE_CENTS = round(RECONCILIATION_AMOUNT_TOLERANCE * 100)
+RECONCILIATION_REPORT_FIELDS = [
+    "line", "transaction_id", "amount", "date", "payment_id", "student_id",
+    "payment_amount", "payment_date", "reason"
+]
+PAYMENT_RECONCILIATION_PROJECTION = {
+    "_id": 0, "id": 1, "student_id": 1, "amount": 1, "payment_date": 1, "transaction_id": 1
+}
+
+def parse_statement_date(value):
+    value = (value or "").strip()
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(value.replace('Z', '+00:00')).date()
+    except ValueError:
+        pass
+    for date_format in ("%d/%m/%Y", "%d-%m-%Y", "%m/%d/%Y"):
+        try:
+            return datetime.strptime(value, date_format).date()
+        except ValueError:
+            continue
+    return None
+
+def parse_statement_line(line_number, row):
+    transaction_id = (row.get("transaction_id") or "").strip() or None
+    try:
+        amount = float((row.get("amount") or "").replace(",", ""))
+    except ValueError:
+        amount = None
+    # float() accepts nan/inf, which cannot be compared in cents
+    if amount is not None and not math.isfinite(amount):
+        amount = None
+    return {
+        "line": line_number,
+        "transaction_id": transaction_id,
+        "amount": amount,
+        "date": parse_statement_date(row.get("date")),
+    }
+
+def payment_day(payment):
+    return parse_statement_date(str(payment.get("payment_date") or "")[:10])
+
+def to_cents(amount):
+    return round(amount * 100)
+
+def amounts_match(line, payment):
+    return abs(to_cents(line["amount"]) - to_cents(payment["amount"])) <= RECONCILIATION_TOLERANCE_CENTS
+
+def dates_match(line, payment):
+    day = payment_day(payment)
+    if line["date"] is None or day is None:
+        return True
+    return abs((line["date"] - day).days) <= RECONCILIATION_DATE_WINDOW_DAYS
+
+def reconciliation_row(line, payment=None, reason=None):
+    return {
+        "line": line["line"],
+        "transaction_id": line["transaction_id"] or "",
+        "amount": "" if line["amount"] is None else line["amount"],
+        "date": line["date"].isoformat() if line["date"] else "",
+        "payment_id": payment["id"] if payment else "",
+        "student_id": payment.get("student_id", "") if payment else "",
+        "payment_amount": payment["amount"] if payment else "",
+        "payment_date": payment.get("payment_date", "") if payment else "",
+        "reason": reason or "",
+    }
+
+async def reconcile_chunk(lines, claimed_payment_ids):
+    """Match one chunk of statement lines; returns (kind, row) pairs.
+
+    Reads go to the primary: a stale secondary would report recent
+    payments as unmatched.
+    """
+    results = []
+
+    # Lines carrying a transaction id: one indexed $in query for the chunk
+    id_lines = [line for line in lines if line["transaction_id"] and line["amount"] is not None]
+    by_transaction = {}
+    if id_lines:
+        cursor = db.payments.find(
+            {"transaction_id": {"$in": list({line["transaction_id"] for line in id_lines})}},
+            PAYMENT_RECONCILIATION_PROJECTION
+        )
+        async for payment in cursor:
+            by_transaction.setdefault(payment["transaction_id"], payment)
+        record_served_by(cursor)
+    for line in id_lines:
+        payment = by_transaction.get(line["transaction_id"])
+        if payment is None:
+            results.append((ReconciliationReportKind.UNMATCHED, reconciliation_row(line, reason="transaction id not found")))
+            continue
+        if payment["id"] in claimed_payment_ids:
+            results.append((ReconciliationReportKind.MISMATCHED, reconciliation_row(line, payment, "duplicate transaction id")))
+            continue
+        claimed_payment_ids.add(payment["id"])
+        if not amounts_match(line, payment):
+            results.append((ReconciliationReportKind.MISMATCHED, reconciliation_row(line, payment, "amount differs")))
+        elif not dates_match(line, payment):
+            results.append((ReconciliationReportKind.MISMATCHED, reconciliation_row(line, payment, "date differs")))
+        else:
+            results.append((ReconciliationReportKind.MATCHED, reconciliation_row(line, payment)))
+
+    # Lines without an id: fuzzy match on amount within tolerance and date
+    # within the window, against payments that have no transaction id
+    fuzzy_lines = [line for line in lines if not line["transaction_id"] and line["amount"] is not None and line["date"]]
+    candidates_by_cents = {}
+    if fuzzy_lines:
+        window = timedelta(days=RECONCILIATION_DATE_WINDOW_DAYS + 1)
+        earliest = min(line["date"] for line in fuzzy_lines) - window
+        latest = max(line["date"] for line in fuzzy_lines) + window
+        amounts = sorted({round(line["amount"], 2) for line in fuzzy_lines})
+        # Half a cent of slack; amounts_match makes the exact decision
+        query_tolerance = RECONCILIATION_AMOUNT_TOLERANCE + 0.005
+        query = {
+            "transaction_id": {"$in": [None, ""]},
+            "payment_date": {"$gte": earliest.isoformat(), "$lte": latest.isoformat()},
+            "$or": [
+                {"amount": {"$gte": amount - query_tolerance, "$lte": amount + query_tolerance}}
+                for amount in amounts
+            ],
+        }
+        cursor = db.payments.find(query, PAYMENT_RECONCILIATION_PROJECTION)
+        async for payment in cursor:
+            if payment["id"] not in claimed_payment_ids:
+                candidates_by_cents.setdefault(to_cents(payment["amount"]), []).append(payment)
+        record_served_by(cursor)
+    for line in fuzzy_lines:
+        best = None
+        line_cents = to_cents(line["amount"])
+        for cents in range(line_cents - RECONCILIATION_TOLERANCE_CENTS, line_cents + RECONCILIATION_TOLERANCE_CENTS + 1):
+            for payment in candidates_by_cents.get(cents, ()):
+                if payment["id"] in claimed_payment_ids or not amounts_match(line, payment) or not dates_match(line, payment):
+                    continue
+                distance = abs((line["date"] - payment_day(payment)).days)
+                if best is None or distance < best[0]:
+                    best = (distance, payment)
+        if best is None:
+            results.append((ReconciliationReportKind.UNMATCHED, reconciliation_row(line, reason="no payment with matching amount and date")))
+        else:
+            claimed_payment_ids.add(best[1]["id"])
+            results.append((ReconciliationReportKind.MATCHED, reconciliation_row(line, best[1], "matched on amount and date")))
+
+    for line in lines:
+        if line["amount"] is None:
+            results.append((ReconciliationReportKind.UNMATCHED, reconciliation_row(line, reason="invalid amount")))
+        elif not line["transaction_id"] and not line["date"]:
+            results.append((ReconciliationReportKind.UNMATCHED, reconciliation_row(line, reason="no transaction id or date")))
+
+    results.sort(key=lambda result: result[1]["line"])
+    return results
+
+def reconciliation_report_path(reconciliation_id, kind: ReconciliationReportKind):
+    return RECONCILIATION_DIR / reconciliation_id / f"{kind.value}.csv"
+
+@api_router.post("/reconciliation", response_model=Reconciliation)
+async def create_reconciliation(file: UploadFile = File(...)):
+    """Reconcile a bank/gateway CSV (transaction_id, amount, date columns) against payments.
+
+    The file is read and matched in chunks, and results are streamed to
+    per-kind CSV reports, so memory stays bounded regardless of file size.
+    """
+    reconciliation = Reconciliation(filename=file.filename)
+
+    reader = csv.DictReader(codecs.iterdecode(file.file, "utf-8-sig"))
+    try:
+        fieldnames = await asyncio.to_thread(lambda: reader.fieldnames)
+    except (UnicodeDecodeError, csv.Error) as e:
+        raise HTTPException(status_code=400, detail=f"Could not read statement file: {e}")
+    if fieldnames is None:
+        raise HTTPException(status_code=400, detail="Statement file is empty")
+    reader.fieldnames = [name.strip().lower() for name in fieldnames]
+    if "amount" not in reader.fieldnames:
+        raise HTTPException(status_code=400, detail="Statement file must have an 'amount' column")
+
+    (RECONCILIATION_DIR / reconciliation.id).mkdir(parents=True, exist_ok=True)
+
+    report_files = {kind: open(reconciliation_report_path(reconciliation.id, kind), "w", newline="") for kind in ReconciliationReportKind}
+    try:
+        writers = {kind: csv.DictWriter(handle, fieldnames=RECONCILIATION_REPORT_FIELDS) for kind, handle in report_files.items()}
+        for writer in writers.values():
+            writer.writeheader()
+
+        claimed_payment_ids = set()
+        # Line numbers count the header as line 1
+        rows = enumerate(reader, start=2)
+        while True:
+            chunk = await asyncio.to_thread(lambda: list(itertools.islice(rows, RECONCILIATION_CHUNK_SIZE)))
+            if not chunk:
+                break
+            lines = [parse_statement_line(line_number, row) for line_number, row in chunk]
+            for kind, row in await reconcile_chunk(lines, claimed_payment_ids):
+                writers[kind].writerow(row)
+                setattr(reconciliation, kind.value, getattr(reconciliation, kind.value) + 1)
+            reconciliation.total_lines += len(lines)
+    except (UnicodeDecodeError, csv.Error) as e:
+        raise HTTPException(status_code=400, detail=f"Could not read statement file: {e}")
+    finally:
+        for handle in report_files.values():
+            handle.close()
+
+    return reconciliation
+
+@api_router.get("/reconciliation/{reconciliation_id}/reports/{kind}")
+async def download_reconciliation_report(reconciliation_id: str, kind: ReconciliationReportKind):
+    path = reconciliation_report_path(reconciliation_id, kind)
+    # Ids are generated uuids; reject anything that would escape the report directory
+    if path.resolve().parent.parent != RECONCILIATION_DIR.resolve() or not path.exists():
+        raise HTTPException(status_code=404, detail="Reconciliation report not found")
+    return FileResponse(path, media_type="text/csv", filename=f"reconciliation-{reconciliation_id}-{kind.value}.csv")
+
 # Include the router in the main app
 app.include_router(api_router)
 
@@ -350,8 +1233,34 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 @app.on_event("shutdown")
 async def shutdown_db_client():
+    # Stop any in-flight background startup before the client goes away
+    task = getattr(app.state, "db_startup_task", None)
+    if task is not None and not task.done():
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
     client.close()
+    if statement_executor is not None:
+        statement_executor.shutdown(wait=False, cancel_futures=True)
 
 @app.get("/")
 async def health_check():
-    return {"status": "ok", "db": "connected"}
+    # Liveness only: never waits on the database
+    return {"status": "ok", "db": "connected" if db_ready.is_set() else "starting"}
+
+@app.get("/ready")
+async def readiness_check():
+    if not db_ready.is_set():
+        # A failed background startup is retried on the next readiness probe
+        task = getattr(app.state, "db_startup_task", None)
+        if db_startup_error is not None and (task is None or task.done()):
+            app.state.db_startup_task = asyncio.create_task(run_db_startup())
+        return JSONResponse(
+            status_code=503,
+            content={"status": "starting" if db_startup_error is None else "error", "error": db_startup_error}
+        )
+    return {"status": "ready", "timings_ms": {name: round(seconds * 1000, 1) for name, seconds in startup_timings.items()}}
+
+_APP_IMPORTED = time.perf_counter()
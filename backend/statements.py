@@ -0,0 +1,104 @@
+"""Fee statement rendering.
+
+Kept separate from server.py so process pool workers only import this
+module, not the app and its MongoDB client.
+"""
+import csv
+import html
+import io
+import re
+from pathlib import Path
+
+
+def statement_filename(statement, extension):
+    # Sanitizing can make distinct student ids collide, so append the unique id
+    student = statement["student"]
+    safe_id = re.sub(r'[^A-Za-z0-9_-]', '_', student["student_id"])
+    return f"{safe_id}-{student['id']}.{extension}"
+
+
+def format_date(value):
+    # Dates are stored as ISO strings; only the day is shown on statements
+    return str(value)[:10] if value else ""
+
+
+def render_statement_html(statement):
+    student = statement["student"]
+    fee_rows = "".join(
+        f"<tr><td>{html.escape(fee.get('fee_name') or '')}</td>"
+        f"<td>{format_date(fee.get('due_date'))}</td>"
+        f"<td class=\"amount\">{fee.get('amount_due', 0):.2f}</td></tr>"
+        for fee in statement["fees"]
+    )
+    payment_rows = "".join(
+        f"<tr><td>{format_date(payment.get('payment_date'))}</td>"
+        f"<td>{html.escape(payment.get('payment_method') or '')}</td>"
+        f"<td>{html.escape(payment.get('transaction_id') or '')}</td>"
+        f"<td class=\"amount\">{payment.get('amount', 0):.2f}</td></tr>"
+        for payment in statement["payments"]
+    )
+    return f"""<!DOCTYPE html>
+<html>
+<head>
+<meta charset="utf-8">
+<title>Fee Statement - {html.escape(student['student_id'])}</title>
+<style>
+body {{ font-family: sans-serif; margin: 2em; }}
+table {{ border-collapse: collapse; width: 100%; margin-bottom: 1.5em; }}
+th, td {{ border: 1px solid #ccc; padding: 4px 8px; text-align: left; }}
+.amount {{ text-align: right; }}
+</style>
+</head>
+<body>
+<h1>Fee Statement</h1>
+<p><strong>{html.escape(student['name'])}</strong> ({html.escape(student['student_id'])})<br>
+{html.escape(student['course'])}, Year {student['year']}</p>
+<h2>Fees Due</h2>
+<table>
+<tr><th>Fee</th><th>Due Date</th><th class="amount">Amount</th></tr>
+{fee_rows}
+</table>
+<h2>Payments</h2>
+<table>
+<tr><th>Date</th><th>Method</th><th>Transaction</th><th class="amount">Amount</th></tr>
+{payment_rows}
+</table>
+<p>Total due: {statement['total_due']:.2f}<br>
+Total paid: {statement['total_paid']:.2f}<br>
+<strong>Balance: {statement['balance']:.2f}</strong></p>
+</body>
+</html>
+"""
+
+
+def render_statement_csv(statement):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(["type", "date", "description", "reference", "amount"])
+    for fee in statement["fees"]:
+        writer.writerow(["fee", format_date(fee.get("due_date")), fee.get("fee_name") or "", "", fee.get("amount_due", 0)])
+    for payment in statement["payments"]:
+        writer.writerow([
+            "payment", format_date(payment.get("payment_date")), payment.get("payment_method") or "",
+            payment.get("transaction_id") or "", payment.get("amount", 0)
+        ])
+    writer.writerow(["total_due", "", "", "", statement["total_due"]])
+    writer.writerow(["total_paid", "", "", "", statement["total_paid"]])
+    writer.writerow(["balance", "", "", "", statement["balance"]])
+    return buffer.getvalue()
+
+
+RENDERERS = {
+    "html": render_statement_html,
+    "csv": render_statement_csv,
+}
+
+
+def render_statement_chunk(statements, statement_format, output_dir):
+    """Render a chunk of statements into output_dir; runs in a worker process."""
+    render = RENDERERS[statement_format]
+    output_dir = Path(output_dir)
+    for statement in statements:
+        path = output_dir / statement_filename(statement, statement_format)
+        path.write_text(render(statement), encoding="utf-8")
+    return len(statements)
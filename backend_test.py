@@ -2,6 +2,10 @@ import requests
 import sys
 from datetime import datetime, timezone
 import json
+import time
+import io
+import csv
+import zipfile
 
 class CRPSystemTester:
     def __init__(self, base_url="https://college-crp.preview.emergentagent.com"):
@@ -58,6 +62,38 @@ class CRPSystemTester:
             print(f"❌ Failed - Error: {str(e)}")
             return False, {}
 
+    def test_health_and_readiness(self):
+        """Test liveness answers regardless of DB state and readiness reports timings"""
+        self.tests_run += 1
+        print("\n🔍 Testing Liveness...")
+        try:
+            response = requests.get(f"{self.base_url}/")
+            body = response.json()
+        except Exception as e:
+            print(f"❌ Failed - Error: {str(e)}")
+            return False
+        if response.status_code != 200 or body.get("status") != "ok" or body.get("db") not in ("connected", "starting"):
+            print(f"❌ Failed - Unexpected liveness response: {response.status_code} {body}")
+            return False
+        self.tests_passed += 1
+        print(f"✅ Passed - Status: {response.status_code}, db: {body['db']}")
+
+        # Readiness may lag behind liveness on a cold start
+        self.tests_run += 1
+        print("\n🔍 Testing Readiness...")
+        for _ in range(30):
+            response = requests.get(f"{self.base_url}/ready")
+            if response.status_code == 200:
+                break
+            time.sleep(1)
+        body = response.json()
+        if response.status_code != 200 or "timings_ms" not in body or "db_ping" not in body["timings_ms"]:
+            print(f"❌ Failed - Unexpected readiness response: {response.status_code} {body}")
+            return False
+        self.tests_passed += 1
+        print(f"✅ Passed - Timings: {body['timings_ms']}")
+        return True
+
     def test_dashboard_summary(self):
         """Test dashboard summary endpoint"""
         success, response = self.run_test(
@@ -145,6 +181,31 @@ class CRPSystemTester:
 
         return success
 
+    def test_batch_lookup(self):
+        """Test batch lookup preserves input order and marks missing ids"""
+        if not self.created_data['students']:
+            print("❌ Cannot test batch lookup - missing students")
+            return False
+
+        ids = [student['id'] for student in reversed(self.created_data['students'])]
+        ids.insert(1, "missing-student-id")
+        success, response = self.run_test(
+            "Batch Lookup Students",
+            "POST",
+            "students/batch",
+            200,
+            data={"ids": ids}
+        )
+
+        if success:
+            if [item['id'] for item in response] == ids and response[1]['found'] is False:
+                print("   ✅ Order preserved and missing id marked")
+            else:
+                print("   ❌ Batch response does not match requested ids")
+                return False
+
+        return success
+
     def test_create_fee_structures(self):
         """Create test fee structures"""
         fee_structures_data = [
@@ -349,6 +410,207 @@ class CRPSystemTester:
 
         return success
 
+    def test_reconciliation(self):
+        """Test reconciling a statement CSV against payments"""
+        if not self.created_data['students']:
+            print("❌ Cannot test reconciliation - missing students")
+            return False
+
+        student_id = self.created_data['students'][0]['id']
+        suffix = str(int(time.time() * 1000))
+        payments = [
+            {"transaction_id": f"REC-A-{suffix}", "amount": 500.0, "payment_date": "2024-10-01T10:00:00+00:00"},
+            {"transaction_id": f"REC-B-{suffix}", "amount": 750.0, "payment_date": "2024-10-01T10:00:00+00:00"},
+            {"transaction_id": None, "amount": 1234.56, "payment_date": "2001-01-15T10:00:00+00:00"},
+        ]
+        for payment_data in payments:
+            success, _ = self.run_test(
+                f"Create Payment {payment_data['transaction_id'] or 'without transaction id'}",
+                "POST",
+                "payments",
+                200,
+                data={"student_id": student_id, "payment_method": "online", **payment_data}
+            )
+            if not success:
+                return False
+
+        statement = "\n".join([
+            "transaction_id,amount,date",
+            f"REC-A-{suffix},500.00,2024-10-01",     # exact id match
+            f"REC-A-{suffix},500.00,2024-10-01",     # duplicate id
+            f"REC-B-{suffix},999.00,2024-10-01",     # amount mismatch
+            f"REC-UNKNOWN-{suffix},10.00,2024-10-01",  # unknown id
+            ",1234.56,2001-01-16",                   # fuzzy amount/date match
+        ]) + "\n"
+
+        self.tests_run += 1
+        print("\n🔍 Testing Reconciliation Upload...")
+        response = requests.post(
+            f"{self.api_url}/reconciliation",
+            files={"file": ("statement.csv", statement.encode(), "text/csv")}
+        )
+        result = response.json() if response.status_code == 200 else {}
+        expected = {"total_lines": 5, "matched": 2, "mismatched": 2, "unmatched": 1}
+        if any(result.get(key) != value for key, value in expected.items()):
+            print(f"❌ Failed - Expected {expected}, got {response.status_code} {response.text}")
+            return False
+        self.tests_passed += 1
+        print(f"✅ Passed - {expected}")
+
+        self.tests_run += 1
+        print("\n🔍 Testing Reconciliation Reports...")
+        expected_reasons = {
+            "matched": ["", "matched on amount and date"],
+            "mismatched": ["duplicate transaction id", "amount differs"],
+            "unmatched": ["transaction id not found"],
+        }
+        for kind, reasons in expected_reasons.items():
+            response = requests.get(f"{self.api_url}/reconciliation/{result['id']}/reports/{kind}")
+            rows = list(csv.DictReader(io.StringIO(response.text)))
+            if response.status_code != 200 or [row['reason'] for row in rows] != reasons:
+                print(f"❌ Failed - {kind} report: {response.status_code} {rows}")
+                return False
+        self.tests_passed += 1
+        print("✅ Passed - Reports match")
+        return True
+
+    def test_statement_job(self):
+        """Test a fee statement job runs to completion and its zip downloads"""
+        if not self.created_data['students'] or not self.created_data['fee_structures']:
+            print("❌ Cannot test statements - missing students or fee structures")
+            return False
+
+        # A payment against a fee structure makes that fee due on the statement
+        student = self.created_data['students'][0]
+        fee_structure = self.created_data['fee_structures'][0]
+        success, _ = self.run_test(
+            "Create Payment Against Fee Structure",
+            "POST",
+            "payments",
+            200,
+            data={
+                "student_id": student['id'],
+                "fee_structure_id": fee_structure['id'],
+                "amount": fee_structure['amount'] * 0.5,
+                "payment_date": datetime.now(timezone.utc).isoformat(),
+                "payment_method": "online"
+            }
+        )
+        if not success:
+            return False
+
+        success, job = self.run_test(
+            "Create Statement Job",
+            "POST",
+            "statements/jobs",
+            200,
+            data={"course": "Computer Science", "year": 2, "format": "csv"}
+        )
+        if not success:
+            return False
+
+        self.tests_run += 1
+        print("\n🔍 Testing Statement Job Progress...")
+        for _ in range(60):
+            job = requests.get(f"{self.api_url}/statements/jobs/{job['id']}").json()
+            if job.get('status') in ("completed", "failed"):
+                break
+            time.sleep(1)
+        if job.get('status') != "completed" or job.get('completed') != job.get('total'):
+            print(f"❌ Failed - Job did not complete: {job}")
+            return False
+        self.tests_passed += 1
+        print(f"✅ Passed - {job['completed']}/{job['total']} statements")
+
+        self.tests_run += 1
+        print("\n🔍 Testing Statement Job Download...")
+        response = requests.get(f"{self.api_url}/statements/jobs/{job['id']}/download")
+        try:
+            archive = zipfile.ZipFile(io.BytesIO(response.content))
+            names = archive.namelist()
+        except zipfile.BadZipFile:
+            print(f"❌ Failed - Not a zip archive (status {response.status_code})")
+            return False
+        if response.status_code != 200 or len(names) != job['total'] or job['total'] == 0:
+            print(f"❌ Failed - Expected {job['total']} statements, got {names}")
+            return False
+        if 'output_dir' in job or 'archive_path' in job:
+            print("❌ Failed - Job exposes server paths")
+            return False
+
+        statement_name = next((name for name in names if name.endswith(f"-{student['id']}.csv")), None)
+        if statement_name is None:
+            print(f"❌ Failed - No statement for {student['student_id']} in {names}")
+            return False
+        totals = {
+            row[0]: float(row[4])
+            for row in csv.reader(io.StringIO(archive.read(statement_name).decode()))
+            if row[0] in ("total_due", "total_paid", "balance")
+        }
+        if totals.get('total_due', 0) <= 0 or totals['balance'] != totals['total_due'] - totals['total_paid']:
+            print(f"❌ Failed - Unexpected statement totals: {totals}")
+            return False
+        self.tests_passed += 1
+        print(f"✅ Passed - Archive has {len(names)} statements, totals {totals}")
+        return True
+
+    def test_columnar_formats(self):
+        """Test Arrow and MessagePack listings return the same rows"""
+        try:
+            import pyarrow.ipc
+            import msgpack
+        except ImportError:
+            print("\n⚠️  Skipping columnar format tests - pyarrow/msgpack not installed")
+            return True
+
+        # JSON reads the primary with a 1000-row cap while the columnar formats
+        # stream every row from the (possibly stale) reporting handle, so
+        # compare Arrow with MessagePack over the same bounded set: the
+        # expenses created by this run, once the reporting handle sees them
+        created_ids = {expense['id'] for expense in self.created_data['expenses']}
+        if not created_ids:
+            print("❌ Cannot test columnar formats - missing expenses")
+            return False
+
+        self.tests_run += 1
+        print("\n🔍 Testing Columnar Expense Listings...")
+        for _ in range(20):
+            arrow_response = requests.get(
+                f"{self.api_url}/expenses", headers={"Accept": "application/vnd.apache.arrow.stream"}
+            )
+            msgpack_response = requests.get(f"{self.api_url}/expenses", headers={"Accept": "application/msgpack"})
+            try:
+                arrow_ids = set(pyarrow.ipc.open_stream(arrow_response.content).read_all().column('id').to_pylist())
+                header, *batches = msgpack.Unpacker(io.BytesIO(msgpack_response.content), timestamp=3)
+                msgpack_ids = {expense_id for batch in batches for expense_id in batch['columns']['id']}
+            except Exception as e:
+                print(f"❌ Failed - Could not decode responses: {str(e)}")
+                return False
+            if created_ids <= arrow_ids and created_ids <= msgpack_ids:
+                break
+            time.sleep(5)
+
+        arrow_rows = len(arrow_ids & created_ids)
+        msgpack_rows = len(msgpack_ids & created_ids)
+        if not (arrow_rows == msgpack_rows == len(created_ids)):
+            print(f"❌ Failed - Row counts differ: created={len(created_ids)} arrow={arrow_rows} msgpack={msgpack_rows}")
+            return False
+
+        json_response = requests.get(f"{self.api_url}/expenses")
+        refused_response = requests.get(
+            f"{self.api_url}/expenses",
+            headers={"Accept": "application/vnd.apache.arrow.stream;q=0, application/json"}
+        )
+        if json_response.headers.get('Vary') != "Accept" or arrow_response.headers.get('Vary') != "Accept":
+            print("❌ Failed - Missing Vary: Accept")
+            return False
+        if not refused_response.headers.get('content-type', '').startswith("application/json"):
+            print(f"❌ Failed - q=0 Arrow was served: {refused_response.headers.get('content-type')}")
+            return False
+        self.tests_passed += 1
+        print(f"✅ Passed - {arrow_rows} created expenses in Arrow and MessagePack")
+        return True
+
     def test_dashboard_after_data(self):
         """Test dashboard summary after creating data"""
         success, response = self.run_test(
@@ -377,12 +639,16 @@ def main():
     # Test sequence
     test_results = []
     
+    # 0. Test liveness and readiness
+    test_results.append(tester.test_health_and_readiness())
+
     # 1. Test initial dashboard
     test_results.append(tester.test_dashboard_summary())
     
     # 2. Test students module
     test_results.append(tester.test_create_students())
     test_results.append(tester.test_get_students())
+    test_results.append(tester.test_batch_lookup())
     
     # 3. Test fee structures module
     test_results.append(tester.test_create_fee_structures())
@@ -399,8 +665,15 @@ def main():
     # 6. Test expenses module
     test_results.append(tester.test_create_expenses())
     test_results.append(tester.test_get_expenses())
+    test_results.append(tester.test_columnar_formats())
     
-    # 7. Test dashboard after data creation
+    # 7. Test payment reconciliation
+    test_results.append(tester.test_reconciliation())
+
+    # 8. Test bulk fee statements
+    test_results.append(tester.test_statement_job())
+
+    # 9. Test dashboard after data creation
     test_results.append(tester.test_dashboard_after_data())
     
     # Print final results